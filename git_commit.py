@@ -0,0 +1,216 @@
+"""
+Commit logic used by the executor and the git worker.
+Kept apart from the interactive scheduler so each launchd fire imports only what it needs.
+"""
+
+import subprocess
+import sys
+import os
+from datetime import datetime
+
+try:
+    # Optional: commit in-process through libgit2 instead of running git
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+# Open pygit2 repositories, reused across commits in a long-lived process
+_repositories = {}
+
+# Characters that make a path a pattern for libgit2; such folders are committed with git
+GLOB_CHARS = frozenset("*?[\\")
+
+# Hooks `git commit` runs; libgit2 runs none, so repositories with any of them are committed with git
+COMMIT_HOOKS = ("pre-commit", "prepare-commit-msg", "commit-msg", "post-commit")
+
+class GitError(Exception):
+    """A git step failed; the message is ready to show to the user."""
+
+def _commit_with_git(repo_path, relative_paths, commit_message):
+    """Commit the folders by running git. Returns False if there was nothing to commit."""
+    pathspecs = [relative_path + "/" for relative_path in relative_paths]
+
+    # git status reports a missing folder as clean, so check that each folder is
+    # on disk, or was deleted but still has files in HEAD to commit the removal of
+    for relative_path in relative_paths:
+        if os.path.isdir(os.path.join(repo_path, relative_path)):
+            continue
+        result = subprocess.run(
+            ["git", "-C", repo_path, "cat-file", "-t", f"HEAD:{relative_path}"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
+        )
+        if result.stdout.strip() != "tree":
+            raise GitError(f"Error: folder {relative_path} does not exist and is not tracked in HEAD")
+
+    # Check for changes first, so an unchanged folder never pays for an index write.
+    # Untracked or modified files inside a submodule cannot be staged from here,
+    # so only a submodule that moved to another commit counts as a change
+    result = subprocess.run(
+        ["git", "-C", repo_path, "status", "--porcelain=v2", "-uall", "-z",
+         "--ignore-submodules=dirty", "--"] + pathspecs,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    if result.returncode != 0:
+        raise GitError(f"Error checking status: {result.stderr.decode(errors='replace')}")
+    if not result.stdout:
+        return False
+    
+    # Add the folders (git reports "not a git repository" itself if needed)
+    result = subprocess.run(
+        ["git", "-C", repo_path, "add", "--"] + pathspecs,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    if result.returncode != 0:
+        raise GitError(f"Error adding files: {result.stderr}")
+    
+    # Commit only these folders. The status probe showed changes, so any failure
+    # here (a rejecting hook included) is an error. Only stderr is ever read
+    result = subprocess.run(
+        ["git", "-C", repo_path, "commit", "--only", "-m", commit_message, "--"] + pathspecs,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    if result.returncode != 0:
+        raise GitError(f"Error committing (git exited with {result.returncode}): {result.stderr}")
+    return True
+
+def _graft_tree_entry(repo, tree, parts, entry):
+    """Return the id of `tree` with the entry at path `parts` set to `entry` (id, filemode), or removed if None."""
+    builder = repo.TreeBuilder(tree) if tree is not None else repo.TreeBuilder()
+    name = parts[0]
+    if len(parts) > 1:
+        child = tree[name] if tree is not None and name in tree else None
+        child_tree = repo[child.id] if child is not None and child.filemode == pygit2.GIT_FILEMODE_TREE else None
+        child_id = _graft_tree_entry(repo, child_tree, parts[1:], entry)
+        entry = (child_id, pygit2.GIT_FILEMODE_TREE) if len(repo[child_id]) else None
+    if entry is None:
+        if builder.get(name) is not None:
+            builder.remove(name)
+    else:
+        builder.insert(name, *entry)
+    return builder.write()
+
+def _open_repository(repo_path):
+    """Return the pygit2 repository at repo_path, opening it on first use."""
+    repo = _repositories.get(repo_path)
+    if repo is None:
+        repo = _repositories[repo_path] = pygit2.Repository(repo_path)
+    return repo
+
+def _needs_git_commit(repo):
+    """Return True if `git commit` would run a hook or sign the commit, neither of which libgit2 does."""
+    config = repo.config
+    try:
+        if config.get_bool("commit.gpgsign"):
+            return True
+    except KeyError:
+        pass
+
+    if "core.hooksPath" in config:
+        # A relative hooksPath is relative to where hooks run, the top of the working tree
+        hooks_dir = os.path.join(repo.workdir or repo.path, os.path.expanduser(config["core.hooksPath"]))
+    else:
+        # A linked worktree keeps its hooks in the main repository's git directory
+        common_dir = repo.path
+        try:
+            with open(os.path.join(repo.path, "commondir")) as f:
+                common_dir = os.path.join(repo.path, f.read().strip())
+        except FileNotFoundError:
+            pass
+        hooks_dir = os.path.join(common_dir, "hooks")
+
+    return any(os.access(os.path.join(hooks_dir, hook), os.X_OK) for hook in COMMIT_HOOKS)
+
+def _commit_with_pygit2(repo_path, relative_paths, commit_message):
+    """Commit the folders in-process with libgit2. Returns False if there was nothing to commit."""
+    repo = _open_repository(repo_path)
+
+    if repo.head_is_unborn:
+        head_tree, parents = None, []
+    else:
+        head_commit = repo.head.peel(pygit2.Commit)
+        head_tree, parents = head_commit.tree, [head_commit.id]
+
+    # add_all matches nothing for a missing folder, so check that each folder is
+    # on disk, or was deleted but still has files in HEAD to commit the removal of
+    pathspecs = [] if "." in relative_paths else list(relative_paths)
+    for relative_path in pathspecs:
+        if os.path.isdir(os.path.join(repo_path, relative_path)):
+            continue
+        tree_path = relative_path.replace(os.sep, "/")
+        entry = head_tree[tree_path] if head_tree is not None and tree_path in head_tree else None
+        if entry is None or entry.filemode != pygit2.GIT_FILEMODE_TREE:
+            raise GitError(f"Error: folder {relative_path} does not exist and is not tracked in HEAD")
+
+    # Stage new, modified and deleted files in the folders, like `git add`
+    index = repo.index
+    index.read(False)  # Pick up changes other git processes made since the last commit
+    index.add_all(pathspecs)
+    index_tree = repo[index.write_tree()]
+
+    # Like `git commit --only`: take these folders from the index and everything else from HEAD
+    if not pathspecs:
+        tree_id = index_tree.id
+    else:
+        tree = head_tree
+        for relative_path in pathspecs:
+            tree_path = relative_path.replace(os.sep, "/")
+            entry = index_tree[tree_path] if tree_path in index_tree else None
+            tree_id = _graft_tree_entry(
+                repo, tree, tree_path.split("/"),
+                (entry.id, entry.filemode) if entry is not None else None
+            )
+            tree = repo[tree_id]
+    
+    if head_tree is not None and tree_id == head_tree.id:
+        # Nothing to commit: drop the staged entries instead of paying for an index write
+        index.read(True)
+        return False
+    
+    index.write()
+    signature = repo.default_signature
+    repo.create_commit("HEAD", signature, signature, commit_message, tree_id, parents)
+    return True
+
+def commit_folders(folder_paths, repo_path):
+    """Commit the specified folders of one repository to git in a single commit."""
+    # Normalize once, then get relative paths of folders from repo root
+    folder_paths = [os.path.abspath(folder_path) for folder_path in folder_paths]
+    repo_path = os.path.abspath(repo_path)
+    folder_names = ", ".join(os.path.basename(folder_path) for folder_path in folder_paths)
+    relative_paths = [os.path.relpath(folder_path, repo_path) for folder_path in folder_paths]
+    commit_message = f"Auto-commit {folder_names} - {datetime.now().isoformat(sep=' ', timespec='seconds')}"
+    
+    try:
+        # libgit2 matches folder names as fnmatch patterns and cannot escape them,
+        # and it neither runs hooks nor signs commits
+        if (pygit2 is not None
+                and not any(GLOB_CHARS.intersection(path) for path in relative_paths)
+                and not _needs_git_commit(_open_repository(repo_path))):
+            committed = _commit_with_pygit2(repo_path, relative_paths, commit_message)
+        else:
+            committed = _commit_with_git(repo_path, relative_paths, commit_message)
+        
+        if not committed:
+            print("No changes to commit.")
+            return True
+        
+        print(f"Successfully committed {folder_names}!")
+        return True
+        
+    except GitError as e:
+        print(e, file=sys.stderr)
+        return False
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return False
+
+def commit_folder(folder_path, repo_path):
+    """Commit the specified folder to git."""
+    return commit_folders([folder_path], repo_path)
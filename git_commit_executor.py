@@ -1,13 +1,12 @@
 #!/usr/bin/env python3
 """
-Executor script for scheduled git commits.
-Called by launchd with folder and repo paths as arguments.
+Commit a folder right away, given folder and repo paths as arguments.
+Hands the commit to the running scheduler (git_worker.py), or commits directly if none is up.
 """
 
 import sys
-import os
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from schedule_git_commit import commit_folder
+# Python already puts this script's directory first on sys.path
+from git_worker import request_commit
 
 if __name__ == "__main__":
     if len(sys.argv) != 3:
@@ -15,5 +14,13 @@ if __name__ == "__main__":
         sys.exit(1)
     folder_path = sys.argv[1]
     repo_path = sys.argv[2]
-    commit_folder(folder_path, repo_path)
 
+    response = request_commit(folder_path, repo_path)
+    if response is None:
+        from git_commit import commit_folder
+        ok = commit_folder(folder_path, repo_path)
+    else:
+        sys.stdout.write(response["stdout"])
+        sys.stderr.write(response["stderr"])
+        ok = response["ok"]
+    sys.exit(0 if ok else 1)
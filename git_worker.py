@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Long-lived scheduler that performs every scheduled git commit.
+Kept running by a single launchd agent: it fires the entries in schedules.json
+as they come due, and serves commit requests from git_commit_executor.py over
+a Unix-domain socket, so all commits run in one already-started process.
+"""
+
+import contextlib
+import fcntl
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+from datetime import datetime, timedelta
+from git_commit import commit_folders
+
+SOCKET_PATH = os.path.expanduser("~/Library/Caches/autocommit.sock")
+SCHEDULES_PATH = os.path.expanduser("~/Library/Application Support/AutoCommit/schedules.json")
+
+# Longest the scheduler sleeps between checks, so sleep/wake and clock changes are noticed
+MAX_WAIT_SECONDS = 60
+
+# Entries for the same repository due within this many seconds of each other become one commit
+COALESCE_SECONDS = 2
+
+# Longest a client waits for the scheduler to accept a request, and to answer a reload
+REQUEST_TIMEOUT_SECONDS = 5
+
+# Commits run one at a time, whether scheduled or requested over the socket
+_commit_lock = threading.Lock()
+
+# Set when schedules.json has changed and the scheduler should look again
+_wakeup = threading.Event()
+
+class SchedulesError(Exception):
+    """schedules.json exists but is not a JSON list of entries."""
+
+@contextlib.contextmanager
+def locked_schedules():
+    """Yield the list of schedule entries under an exclusive lock; changes to it are saved on exit."""
+    os.makedirs(os.path.dirname(SCHEDULES_PATH), exist_ok=True)
+    with open(SCHEDULES_PATH + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            with open(SCHEDULES_PATH) as f:
+                schedules = json.load(f)
+        except FileNotFoundError:
+            schedules = []
+        except ValueError as e:
+            raise SchedulesError(f"{SCHEDULES_PATH} is not valid JSON: {e}") from e
+        if not isinstance(schedules, list):
+            raise SchedulesError(f"{SCHEDULES_PATH} does not contain a list of entries")
+        original = list(schedules)
+
+        yield schedules
+
+        if schedules != original:
+            tmp_path = SCHEDULES_PATH + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(schedules, f, indent=2)
+            os.replace(tmp_path, SCHEDULES_PATH)
+
+def _run_commit(folder_paths, repo_path):
+    """Commit the folders under the commit lock, capturing what commit_folders prints."""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    with _commit_lock:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            ok = commit_folders(folder_paths, repo_path)
+    return {"ok": ok, "stdout": stdout.getvalue(), "stderr": stderr.getvalue()}
+
+class CommitRequestHandler(socketserver.StreamRequestHandler):
+    """Handle one request per connection: {"folder": ..., "repo": ...} or {"command": "reload"}."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            if request.get("command") == "reload":
+                _wakeup.set()
+                response = {"ok": True, "stdout": "", "stderr": ""}
+            else:
+                response = _run_commit([request["folder"]], request["repo"])
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            response = {"ok": False, "stdout": "", "stderr": f"Invalid request: {e}\n"}
+
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+def _send_request(request, reply_timeout=REQUEST_TIMEOUT_SECONDS):
+    """Send a request to the running scheduler. Returns None if none is listening or it does not answer in time."""
+    data = json.dumps(request).encode() + b"\n"
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            # A timeout is an OSError, so a scheduler that is stuck counts as not listening
+            sock.settimeout(REQUEST_TIMEOUT_SECONDS)
+            sock.connect(SOCKET_PATH)
+            sock.sendall(data)
+            sock.settimeout(reply_timeout)
+            with sock.makefile("rb") as f:
+                response = f.readline()
+    except OSError:
+        return None
+    if not response:
+        return None
+    return json.loads(response)
+
+def request_commit(folder_path, repo_path):
+    """Ask the running scheduler to commit the folder now. Returns None if none is listening."""
+    # The scheduler runs in a different working directory, so send absolute paths.
+    # Wait as long as the commit takes: giving up would commit the folder a second time alongside it
+    return _send_request(
+        {"folder": os.path.abspath(folder_path), "repo": os.path.abspath(repo_path)},
+        reply_timeout=None
+    )
+
+def notify_scheduler():
+    """Tell the running scheduler that schedules.json changed. Returns False if none is listening."""
+    return _send_request({"command": "reload"}) is not None
+
+def _entry_time(entry):
+    """Return when the schedule entry is due, or None if the entry is malformed."""
+    if not isinstance(entry, dict):
+        return None
+    if not all(isinstance(entry.get(key), str) for key in ("id", "folder", "repo", "when")):
+        return None
+    try:
+        when = datetime.fromisoformat(entry["when"])
+    except ValueError:
+        return None
+    # Entries are written in local time; an offset would not compare with datetime.now()
+    return when if when.tzinfo is None else None
+
+def _fire(repo_path, entries):
+    """Run the due schedule entries of one repository as a single commit and log the result."""
+    # The same folder may be scheduled more than once; commit it once
+    folder_paths = list(dict.fromkeys(entry["folder"] for entry in entries))
+    response = _run_commit(folder_paths, repo_path)
+    with _commit_lock:
+        ids = ", ".join(entry["id"] for entry in entries)
+        print(f"{datetime.now().isoformat(sep=' ', timespec='seconds')} {ids}")
+        sys.stdout.write(response["stdout"])
+        sys.stderr.write(response["stderr"])
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+def run_scheduler():
+    """Fire schedule entries as they come due. Never returns."""
+    last_error = None
+    while True:
+        _wakeup.clear()
+        cutoff = datetime.now() + timedelta(seconds=COALESCE_SECONDS)
+        try:
+            # Entries are removed before they run, so each one fires at most once.
+            # Malformed entries are removed too, after being logged below
+            with locked_schedules() as schedules:
+                times = [_entry_time(e) for e in schedules]
+                malformed = [e for e, when in zip(schedules, times) if when is None]
+                due = [e for e, when in zip(schedules, times) if when is not None and when <= cutoff]
+                upcoming = [when for when in times if when is not None and when > cutoff]
+                schedules[:] = [e for e, when in zip(schedules, times) if when is not None and when > cutoff]
+            last_error = None
+        except SchedulesError as e:
+            # Leave the file for the user to fix, and log the problem once rather than every pass
+            if str(e) != last_error:
+                # Under the lock, so a commit capturing sys.stderr does not take the line
+                with _commit_lock:
+                    print(f"Error: {e}", file=sys.stderr)
+                    sys.stderr.flush()
+                last_error = str(e)
+            malformed, due, upcoming = [], [], []
+
+        if malformed:
+            with _commit_lock:
+                for entry in malformed:
+                    print(f"Skipping malformed schedule entry: {json.dumps(entry)}", file=sys.stderr)
+                sys.stderr.flush()
+
+        # One commit per repository instead of one per entry
+        due_by_repo = {}
+        for entry in due:
+            due_by_repo.setdefault(entry["repo"], []).append(entry)
+        for repo_path, entries in due_by_repo.items():
+            _fire(repo_path, entries)
+
+        timeout = MAX_WAIT_SECONDS
+        if upcoming:
+            seconds_left = (min(upcoming) - datetime.now()).total_seconds()
+            timeout = max(0, min(seconds_left, MAX_WAIT_SECONDS))
+        _wakeup.wait(timeout)
+
+def serve():
+    """Serve commit requests and run the scheduler until killed."""
+    os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+    # Remove a socket left behind by a previous scheduler
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(SOCKET_PATH)
+
+    # One thread per connection, so a reload is answered while a requested commit runs
+    server = socketserver.ThreadingUnixStreamServer(SOCKET_PATH, CommitRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Scheduler listening on {SOCKET_PATH}, reading {SCHEDULES_PATH}")
+    sys.stdout.flush()
+    run_scheduler()
+
+if __name__ == "__main__":
+    try:
+        serve()
+    except KeyboardInterrupt:
+        pass
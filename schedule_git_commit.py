@@ -4,72 +4,56 @@ Interactive script to schedule a git commit for any folder at any time.
 """
 
 import subprocess
+import shutil
 import sys
 import os
-from datetime import datetime
-import plistlib
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+from git_worker import SCHEDULES_PATH, SchedulesError, locked_schedules, notify_scheduler
 
-def commit_folder(folder_path, repo_path):
-    """Commit the specified folder to git."""
-    # Change to the repository directory
-    os.chdir(repo_path)
-    
-    # Get relative path of folder from repo root
-    folder_name = os.path.basename(os.path.abspath(folder_path))
-    relative_path = os.path.relpath(os.path.abspath(folder_path), os.path.abspath(repo_path))
-    
-    try:
-        # Check if we're in a git repository
-        subprocess.run(["git", "status"], check=True, capture_output=True)
-        
-        # Add the folder
-        result = subprocess.run(
-            ["git", "add", relative_path + "/"],
-            capture_output=True,
-            text=True
-        )
-        if result.returncode != 0:
-            print(f"Error adding files: {result.stderr}", file=sys.stderr)
-            return False
-        
-        # Check if there are changes to commit
-        result = subprocess.run(
-            ["git", "diff", "--cached", "--quiet"],
-            capture_output=True
-        )
-        if result.returncode == 0:
-            print("No changes to commit.")
-            return True
-        
-        # Commit with a message
-        commit_message = f"Auto-commit {folder_name} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        result = subprocess.run(
-            ["git", "commit", "-m", commit_message],
-            capture_output=True,
-            text=True
-        )
-        if result.returncode != 0:
-            print(f"Error committing: {result.stderr}", file=sys.stderr)
-            return False
-        
-        print(f"Successfully committed {folder_name}!")
-        return True
-        
-    except subprocess.CalledProcessError as e:
-        print(f"Git error: {e}", file=sys.stderr)
-        return False
-    except Exception as e:
-        print(f"Error: {e}", file=sys.stderr)
-        return False
+# launchd label of the long-lived scheduler (see git_worker.py)
+SCHEDULER_LABEL = "com.autocommit.scheduler"
+
+LAUNCH_AGENTS_DIR = os.path.expanduser("~/Library/LaunchAgents")
+
+# launchd plist for the scheduler agent; the fields are XML-escaped strings
+PLIST_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" "http://www.apple.com/DTDs/PropertyList-1.0.dtd">
+<plist version="1.0">
+<dict>
+	<key>KeepAlive</key>
+	<true/>
+	<key>Label</key>
+	<string>{label}</string>
+	<key>ProgramArguments</key>
+	<array>
+		<string>{python3_path}</string>
+		<string>{script_path}</string>
+	</array>
+	<key>RunAtLoad</key>
+	<true/>
+	<key>StandardErrorPath</key>
+	<string>{stderr_path}</string>
+	<key>StandardOutPath</key>
+	<string>{stdout_path}</string>
+</dict>
+</plist>
+"""
+
+# Characters dropped from folder names when building schedule ids
+_ID_STRIP_CHARS = str.maketrans("", "", " -")
 
 def find_git_repo(path):
     """Find the git repository root containing the given path."""
-    current = os.path.abspath(path)
-    while current != os.path.dirname(current):  # Stop at filesystem root
-        if os.path.exists(os.path.join(current, ".git")):
-            return current
-        current = os.path.dirname(current)
-    return None
+    # git handles worktrees, submodules and $GIT_DIR, unlike looking for a .git directory
+    result = subprocess.run(
+        ["git", "-C", path, "rev-parse", "--show-toplevel"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
 
 def get_user_input():
     """Get folder path and schedule from user."""
@@ -85,9 +69,9 @@ def get_user_input():
             print("Please enter a valid folder path.")
             continue
         
-        # Expand ~ and resolve path
+        # Expand ~ and resolve path (symlinks too, since git reports the resolved repo root)
         folder_path = os.path.expanduser(folder_input)
-        folder_path = os.path.abspath(folder_path)
+        folder_path = os.path.realpath(folder_path)
         
         if not os.path.exists(folder_path):
             print(f"Error: Path '{folder_path}' does not exist.")
@@ -143,101 +127,91 @@ def get_user_input():
     
     if target_datetime < datetime.now():
         print(f"Warning: {target_datetime} is in the past. Using tomorrow instead.")
-        target_datetime = target_datetime.replace(day=target_datetime.day + 1)
+        target_datetime += timedelta(days=1)
     
     return folder_path, repo_path, target_datetime
 
-def create_launchd_plist(folder_path, repo_path, target_datetime, script_path):
-    """Create a launchd plist file for scheduling the commit."""
-    folder_name = os.path.basename(os.path.abspath(folder_path))
-    relative_path = os.path.relpath(os.path.abspath(folder_path), os.path.abspath(repo_path))
+def enable_fast_status(repo_path):
+    """Turn on git's filesystem monitor and untracked cache for the repository.
     
-    # Create a unique label based on folder and timestamp
-    label = f"com.gitcommit.{folder_name.lower().replace(' ', '').replace('-', '')}.{target_datetime.strftime('%Y%m%d%H%M')}"
-    
-    # Find the actual python3 path
-    try:
-        python3_path = subprocess.check_output(["which", "python3"], text=True).strip()
-    except subprocess.CalledProcessError:
-        # Fallback to common paths
-        python3_path = "/usr/bin/python3"
-    
-    # Ensure all paths are absolute
-    script_path = os.path.abspath(script_path)
+    With these, git asks the OS (FSEvents on macOS) what changed instead of
+    scanning the whole worktree, which keeps add/commit fast on large repos.
+    """
+    for args in (
+        ["config", "core.fsmonitor", "true"],
+        ["config", "core.untrackedCache", "true"],
+        ["update-index", "--untracked-cache"],
+    ):
+        result = subprocess.run(
+            ["git", "-C", repo_path] + args,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        if result.returncode != 0:
+            # Only an optimization; older git versions may not support it
+            print(f"Warning: could not run 'git {' '.join(args)}': {result.stderr.strip()}")
+            return False
+    return True
+
+def find_python3():
+    """Find the actual python3 path."""
+    # The running interpreter is already known; only search PATH if it is not
+    return sys.executable or shutil.which("python3") or "/usr/bin/python3"
+
+def create_schedule_entry(folder_path, repo_path, target_datetime):
+    """Create the schedules.json entry for committing the folder at the given time."""
     folder_path = os.path.abspath(folder_path)
-    repo_path = os.path.abspath(repo_path)
-    script_dir = os.path.dirname(script_path)
+    folder_name = os.path.basename(folder_path)
     
+    # Create a unique id based on folder and timestamp
+    schedule_id = f"com.gitcommit.{folder_name.lower().translate(_ID_STRIP_CHARS)}.{target_datetime.strftime('%Y%m%d%H%M')}"
+    
+    return {
+        "id": schedule_id,
+        "folder": folder_path,
+        "repo": os.path.abspath(repo_path),
+        "when": target_datetime.isoformat(timespec="minutes")
+    }
+
+def create_launchd_plist(script_dir):
+    """Create the launchd plist that keeps the scheduler (git_worker.py) running."""
     # Create logs directory if it doesn't exist
     logs_dir = os.path.join(script_dir, "logs")
     os.makedirs(logs_dir, exist_ok=True)
     
-    plist_data = {
-        "Label": label,
-        "ProgramArguments": [
-            python3_path,
-            script_path,
-            folder_path,
-            repo_path
-        ],
-        "StartCalendarInterval": {
-            "Month": target_datetime.month,
-            "Day": target_datetime.day,
-            "Hour": target_datetime.hour,
-            "Minute": target_datetime.minute
-        },
-        "StandardOutPath": os.path.join(logs_dir, f"commit_{folder_name}_{target_datetime.strftime('%Y%m%d_%H%M')}.log"),
-        "StandardErrorPath": os.path.join(logs_dir, f"commit_{folder_name}_{target_datetime.strftime('%Y%m%d_%H%M')}_error.log"),
-        "RunAtLoad": False
+    plist_fields = {
+        "label": SCHEDULER_LABEL,
+        "python3_path": find_python3(),
+        "script_path": os.path.join(script_dir, "git_worker.py"),
+        "stdout_path": os.path.join(logs_dir, "scheduler.log"),
+        "stderr_path": os.path.join(logs_dir, "scheduler_error.log")
     }
+    plist_xml = PLIST_TEMPLATE.format(**{key: escape(value) for key, value in plist_fields.items()})
     
     # Save plist to LaunchAgents
-    launchd_dir = os.path.expanduser("~/Library/LaunchAgents")
-    os.makedirs(launchd_dir, exist_ok=True)
-    plist_path = os.path.join(launchd_dir, f"{label}.plist")
+    os.makedirs(LAUNCH_AGENTS_DIR, exist_ok=True)
+    plist_path = os.path.join(LAUNCH_AGENTS_DIR, f"{SCHEDULER_LABEL}.plist")
     
     with open(plist_path, "wb") as f:
-        plistlib.dump(plist_data, f)
-    
-    return plist_path, label
-
-def main():
-    """Main function."""
-    # Get user input
-    folder_path, repo_path, target_datetime = get_user_input()
-    
-    # Create the commit script
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    commit_script = os.path.join(script_dir, "git_commit_executor.py")
+        f.write(plist_xml.encode())
     
-    # Create executor script if it doesn't exist
-    if not os.path.exists(commit_script):
-        executor_content = '''#!/usr/bin/env python3
-import sys
-import os
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from schedule_git_commit import commit_folder
+    return plist_path
 
-if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: git_commit_executor.py <folder_path> <repo_path>")
-        sys.exit(1)
-    folder_path = sys.argv[1]
-    repo_path = sys.argv[2]
-    commit_folder(folder_path, repo_path)
-'''
-        with open(commit_script, "w") as f:
-            f.write(executor_content)
-        os.chmod(commit_script, 0o755)
-    
-    # Create launchd plist
-    plist_path, label = create_launchd_plist(folder_path, repo_path, target_datetime, commit_script)
-    
-    # Load the launchd job
+def load_scheduler_agent(plist_path):
+    """(Re)load the scheduler agent into launchd, which starts the scheduler."""
     try:
+        # The agent may still be loaded with its scheduler stopped (e.g. after a crash
+        # loop); unloading first makes the load below start it fresh
+        subprocess.run(
+            ["launchctl", "unload", plist_path],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
         result = subprocess.run(
             ["launchctl", "load", plist_path],
-            capture_output=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             text=True
         )
         if result.returncode != 0:
@@ -246,23 +220,61 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"\nError loading scheduler: {e}")
         return False
+    return True
+
+def main():
+    """Main function."""
+    # Get user input
+    folder_path, repo_path, target_datetime = get_user_input()
+    
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    # Speed up git's worktree scans for the scheduled commit
+    enable_fast_status(repo_path)
+    
+    # Add the commit to the scheduler's list, replacing an identical earlier one
+    entry = create_schedule_entry(folder_path, repo_path, target_datetime)
+    try:
+        with locked_schedules() as schedules:
+            schedules[:] = [e for e in schedules if not (isinstance(e, dict) and e.get("id") == entry["id"])]
+            schedules.append(entry)
+    except SchedulesError as e:
+        print(f"\nError: {e}")
+        print("Fix or delete the file, then schedule the commit again.")
+        return False
+    
+    # Have a running scheduler pick up the new entry right away. If none answers,
+    # install the agent on first use (or after the plist was deleted) and load it,
+    # which starts the scheduler; it reads schedules.json on startup
+    if not notify_scheduler():
+        plist_path = os.path.join(LAUNCH_AGENTS_DIR, f"{SCHEDULER_LABEL}.plist")
+        created = not os.path.exists(plist_path)
+        if created:
+            plist_path = create_launchd_plist(script_dir)
+        if not load_scheduler_agent(plist_path):
+            if created:
+                os.remove(plist_path)
+            print("The commit is saved in the schedules file and will run once the scheduler starts.")
+            return False
     
     print("\n" + "=" * 60)
-    print("✓ Scheduler installed successfully!")
+    print("✓ Commit scheduled successfully!")
     print("=" * 60)
     print(f"Folder: {folder_path}")
-    print(f"Scheduled for: {target_datetime.strftime('%Y-%m-%d %H:%M')}")
-    print(f"Plist: {plist_path}")
+    print(f"Scheduled for: {entry['when'].replace('T', ' ')}")
+    print(f"Schedule id: {entry['id']}")
+    print(f"Schedules file: {SCHEDULES_PATH}")
     print()
-    print("To check status: launchctl list | grep " + label)
-    print("To uninstall: launchctl unload " + plist_path)
+    print("To check status: launchctl list | grep " + SCHEDULER_LABEL)
+    print("To cancel: remove the entry with this id from the schedules file")
     print("=" * 60)
     
     return True
 
 if __name__ == "__main__":
     try:
-        main()
+        if not main():
+            sys.exit(1)
     except KeyboardInterrupt:
         print("\n\nCancelled by user.")
         sys.exit(1)